@@ -103,6 +103,34 @@ impl Actor {
         Ok(dataset)
     }
 
+    /// Stores a record in the default key-value store
+    pub async fn set_value(&self, key: &str, body: Vec<u8>, content_type: &str)
+    -> Result<(), Box<dyn std::error::Error + Send + Sync>> {
+        if is_on_apify() {
+            let store_id = env::var("APIFY_DEFAULT_KEY_VALUE_STORE_ID")
+                .map_err(|_| "APIFY_DEFAULT_KEY_VALUE_STORE_ID environment variable not set")?;
+            let token = env::var("APIFY_TOKEN")
+                .map_err(|_| "APIFY_TOKEN environment variable not set")?;
+            let url = format!("https://api.apify.com/v2/key-value-stores/{}/records/{}", store_id, key);
+
+            let response = self.client
+                .put(&url)
+                .header("Authorization", format!("Bearer {}", token))
+                .header("Content-Type", content_type)
+                .body(body)
+                .send()
+                .await?;
+
+            if !response.status().is_success() {
+                return Err(format!("Failed to store record {}: {}", key, response.status()).into());
+            }
+        } else {
+            std::fs::create_dir_all("apify_storage/key_value_stores/default")?;
+            std::fs::write(format!("apify_storage/key_value_stores/default/{}", key), body)?;
+        }
+        Ok(())
+    }
+
     /// Pushes data to default dataset (initializes default DatasetHandle)
     pub async fn push_data<T: serde::Serialize> (&mut self, data: &[T]) 
     -> Result<(), Box<dyn std::error::Error + Send + Sync>> {
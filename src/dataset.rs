@@ -22,7 +22,7 @@ impl DatasetHandle {
                 .map_err(|_| "APIFY_TOKEN environment variable not set")?;
             let url = format!("https://api.apify.com/v2/datasets/{}/items", self.id);
             
-            let json_data = serde_json::to_string(data)?;
+            let json_data = serde_json::to_vec(data)?;
             let response = self.client
                 .post(&url)
                 .header("Authorization", format!("Bearer {}", token))
@@ -37,7 +37,7 @@ impl DatasetHandle {
         } else {
             // For local datasets, save to files
             for val in data.iter() {
-                let json = serde_json::to_string(&val)?;
+                let json = serde_json::to_vec(&val)?;
                 let mut rng = rand::thread_rng();
                 // TODO: Implement increment instead of random
                 let path = format!("apify_storage/datasets/{}/{}.json", self.name, rng.gen::<i32>());
@@ -0,0 +1,51 @@
+use moka::future::Cache;
+use once_cell::sync::Lazy;
+use reqwest::dns::{Addrs, Name, Resolve, Resolving};
+use std::net::SocketAddr;
+use std::sync::Arc;
+use std::time::Duration;
+
+/// How long resolved addresses are reused before looking the host up again
+const DNS_CACHE_TTL: Duration = Duration::from_secs(600);
+
+/// Resolver shared by every HTTP client in the process
+pub static SHARED_RESOLVER: Lazy<Arc<CachingResolver>> = Lazy::new(|| Arc::new(CachingResolver::new(DNS_CACHE_TTL)));
+
+/// DNS resolver that caches lookups, so a burst of new connections to the same
+/// store resolves its host once instead of once per connection
+#[derive(Clone)]
+pub struct CachingResolver {
+    cache: Cache<String, Arc<Vec<SocketAddr>>>,
+}
+
+impl CachingResolver {
+    pub fn new(ttl: Duration) -> Self {
+        Self {
+            cache: Cache::builder()
+                .time_to_live(ttl)
+                .max_capacity(10_000)
+                .build(),
+        }
+    }
+}
+
+impl Resolve for CachingResolver {
+    fn resolve(&self, name: Name) -> Resolving {
+        let cache = self.cache.clone();
+        let host = name.as_str().to_string();
+
+        Box::pin(async move {
+            // Concurrent lookups of the same host share a single resolution
+            let addrs = cache
+                .try_get_with(host.clone(), async move {
+                    let addrs: Vec<SocketAddr> = tokio::net::lookup_host((host.as_str(), 0)).await?.collect();
+                    Ok::<_, std::io::Error>(Arc::new(addrs))
+                })
+                .await
+                .map_err(|e| Box::new(e) as Box<dyn std::error::Error + Send + Sync>)?;
+
+            let addrs: Addrs = Box::new(addrs.as_ref().clone().into_iter());
+            Ok(addrs)
+        })
+    }
+}
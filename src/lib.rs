@@ -1,3 +1,4 @@
+mod dns;
 pub mod models;
 pub mod scraper;
 pub mod schema;
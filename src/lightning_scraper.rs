@@ -1,3 +1,4 @@
+use crate::dns::SHARED_RESOLVER;
 use crate::models::*;
 use crate::schema::*;
 use anyhow::Result;
@@ -111,9 +112,11 @@ impl LightningScraper {
             .user_agent(&scraper_config.user_agent)
             .redirect(reqwest::redirect::Policy::limited(scraper_config.max_redirects))
             .pool_max_idle_per_host(100) // Increased for speed
+            .dns_resolver(SHARED_RESOLVER.clone())
             .pool_idle_timeout(Duration::from_secs(300))
             .gzip(true)
-            .brotli(true) // Enable compression
+            .brotli(true)
+            .zstd(true) // Enable compression
             .tcp_keepalive(Duration::from_secs(60))
             .tcp_nodelay(true) // Disable Nagle's algorithm
             .danger_accept_invalid_certs(true) // For Docker environments with SSL issues
@@ -328,9 +331,7 @@ impl LightningScraper {
                     id: raw_product.id.to_string(),
                     title: raw_product.title,
                     description: self.clean_html_fast(&raw_product.body_html.unwrap_or_default()),
-                    price: raw_product.variants.first()
-                        .and_then(|v| v.price.parse().ok())
-                        .unwrap_or(0.0),
+                    price: raw_product.variants.first().map_or(0.0, |v| v.price),
                     currency: "USD".to_string(),
                     availability: raw_product.available.unwrap_or(false),
                     vendor: raw_product.vendor,
@@ -390,42 +391,12 @@ impl LightningScraper {
 
     /// Zero-copy image transformation
     fn transform_images_fast(&self, images: Vec<RawProductImage>) -> Vec<ProductImage> {
-        images.into_iter()
-            .map(|img| ProductImage {
-                src: img.src,
-                alt: img.alt,
-                width: img.width,
-                height: img.height,
-                position: img.position,
-            })
-            .collect()
+        images.into_iter().map(ProductImage::from).collect()
     }
 
     /// Zero-copy variant transformation
     fn transform_variants_fast(&self, variants: Vec<RawProductVariant>) -> Vec<ProductVariant> {
-        variants.into_iter()
-            .map(|v| ProductVariant {
-                id: v.id.to_string(),
-                title: v.title,
-                price: v.price.parse().unwrap_or(0.0),
-                sku: v.sku,
-                inventory_quantity: v.inventory_quantity.unwrap_or(0),
-                available: v.available.unwrap_or(false),
-                weight: v.weight.unwrap_or(0.0),
-                weight_unit: v.weight_unit.unwrap_or("kg".to_string()),
-                option1: v.option1,
-                option2: v.option2,
-                option3: v.option3,
-                barcode: v.barcode,
-                compare_at_price: v.compare_at_price.and_then(|p| p.parse().ok()),
-                fulfillment_service: v.fulfillment_service,
-                inventory_management: v.inventory_management,
-                inventory_policy: v.inventory_policy,
-                requires_shipping: v.requires_shipping,
-                taxable: v.taxable,
-                tax_code: v.tax_code,
-            })
-            .collect()
+        variants.into_iter().map(ProductVariant::from).collect()
     }
 
     /// Process products pipeline with zero-overhead
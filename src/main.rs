@@ -3,6 +3,7 @@ mod scraper;
 mod schema;
 mod actor;
 mod dataset;
+mod dns;
 mod utils;
 mod multi_website_scraper;
 mod data_wrangling;
@@ -16,6 +17,10 @@ use schema::{ScraperInput, OutputFormat};
 use actor::Actor;
 use tracing::{info, error, warn};
 use serde_json::Value;
+use models::{products_to_csv, ShopifyProduct};
+
+/// Products pushed to the dataset per request while results stream in
+const PUSH_BATCH_SIZE: usize = 100;
 
 #[tokio::main]
 async fn main() -> Result<()> {
@@ -87,31 +92,29 @@ async fn main() -> Result<()> {
             // Process results from all websites
             let mut all_products = Vec::new();
             let mut total_products = 0;
+            let website_count = results.len();
             
-            for (website, products) in &results {
+            for (website, products) in results {
                 info!("⚡ Website {}: {} products", website, products.len());
                 total_products += products.len();
-                all_products.extend(products.clone());
+                all_products.extend(products);
             }
             
             if !all_products.is_empty() {
                 info!("⚡ Successfully scraped {} total products from {} websites", 
-                      total_products, results.len());
-                
-                // Convert products to JSON values for Apify storage
-                let json_products: Vec<Value> = all_products.iter()
-                    .map(|p| serde_json::to_value(p).unwrap())
-                    .collect();
+                      total_products, website_count);
                 
-                // Save to Apify dataset
-                match actor.push_data(&json_products).await {
+                // Save to Apify dataset, serializing straight from the typed products
+                match actor.push_data(&all_products).await {
                     Ok(_) => {
-                        info!("⚡ Successfully saved {} products to Apify dataset", json_products.len());
+                        info!("⚡ Successfully saved {} products to Apify dataset", all_products.len());
                     }
                     Err(e) => {
                         error!("Failed to save data to Apify dataset: {}", e);
                     }
                 }
+                
+                save_csv_output(&actor, &all_products, &input.output_format).await;
             } else {
                 warn!("No products found from any website.");
             }
@@ -139,31 +142,29 @@ async fn main() -> Result<()> {
             // Process results from all websites
             let mut all_products = Vec::new();
             let mut total_products = 0;
+            let website_count = results.len();
             
-            for (website, products) in &results {
+            for (website, products) in results {
                 info!("Website {}: {} products", website, products.len());
                 total_products += products.len();
-                all_products.extend(products.clone());
+                all_products.extend(products);
             }
             
             if !all_products.is_empty() {
                 info!("Successfully scraped {} total products from {} websites", 
-                      total_products, results.len());
+                      total_products, website_count);
                 
-                // Convert products to JSON values for Apify storage
-                let json_products: Vec<Value> = all_products.iter()
-                    .map(|p| serde_json::to_value(p).unwrap())
-                    .collect();
-                
-                // Save to Apify dataset
-                match actor.push_data(&json_products).await {
+                // Save to Apify dataset, serializing straight from the typed products
+                match actor.push_data(&all_products).await {
                     Ok(_) => {
-                        info!("Successfully saved {} products to Apify dataset", json_products.len());
+                        info!("Successfully saved {} products to Apify dataset", all_products.len());
                     }
                     Err(e) => {
                         error!("Failed to save data to Apify dataset: {}", e);
                     }
                 }
+                
+                save_csv_output(&actor, &all_products, &input.output_format).await;
             } else {
                 warn!("No products found from any website.");
             }
@@ -191,27 +192,41 @@ async fn main() -> Result<()> {
             return Ok(());
         };
         
-        // Scrape products
+        // Scrape products, pushing them to the dataset in batches as they arrive
         info!("Starting to scrape {} products", product_handles.len());
-        let products = scraper.scrape_multiple_products(&input.domain, product_handles).await?;
+        let mut product_rx = scraper.scrape_products_stream(&input.domain, product_handles)?;
         
-        if !products.is_empty() {
-            info!("Successfully scraped {} products", products.len());
-            
-            // Convert products to JSON values for Apify storage
-            let json_products: Vec<Value> = products.iter()
-                .map(|p| serde_json::to_value(p).unwrap())
-                .collect();
-            
-            // Save to Apify dataset
-            match actor.push_data(&json_products).await {
-                Ok(_) => {
-                    info!("Successfully saved {} products to Apify dataset", json_products.len());
-                }
-                Err(e) => {
-                    error!("Failed to save data to Apify dataset: {}", e);
+        // CSV is written in one piece at the end, so only then keep everything
+        let keep_products = matches!(input.output_format, OutputFormat::Csv);
+        let mut products = Vec::new();
+        let mut batch = Vec::with_capacity(PUSH_BATCH_SIZE);
+        let mut scraped = 0;
+        let mut saved = 0;
+        
+        while let Some(product) = product_rx.recv().await {
+            scraped += 1;
+            batch.push(product);
+            if batch.len() >= PUSH_BATCH_SIZE {
+                saved += push_products(&mut actor, &batch).await;
+                if keep_products {
+                    products.append(&mut batch);
+                } else {
+                    batch.clear();
                 }
             }
+        }
+        if !batch.is_empty() {
+            saved += push_products(&mut actor, &batch).await;
+            if keep_products {
+                products.append(&mut batch);
+            }
+        }
+        
+        if scraped > 0 {
+            info!("Successfully scraped {} products", scraped);
+            info!("Successfully saved {} products to Apify dataset", saved);
+            
+            save_csv_output(&actor, &products, &input.output_format).await;
         } else {
             warn!("No products found.");
         }
@@ -221,6 +236,32 @@ async fn main() -> Result<()> {
     Ok(())
 }
 
+/// Push a batch of products to the default dataset, returning how many were saved
+async fn push_products(actor: &mut Actor, products: &[ShopifyProduct]) -> usize {
+    match actor.push_data(products).await {
+        Ok(_) => products.len(),
+        Err(e) => {
+            error!("Failed to save data to Apify dataset: {}", e);
+            0
+        }
+    }
+}
+
+/// Store a CSV export next to the dataset when CSV output is requested
+async fn save_csv_output(actor: &Actor, products: &[ShopifyProduct], output_format: &OutputFormat) {
+    if !matches!(output_format, OutputFormat::Csv) {
+        return;
+    }
+
+    match products_to_csv(products) {
+        Ok(csv) => match actor.set_value("OUTPUT.csv", csv, "text/csv").await {
+            Ok(_) => info!("Saved CSV output with {} products", products.len()),
+            Err(e) => error!("Failed to save CSV output: {}", e),
+        },
+        Err(e) => error!("Failed to render CSV output: {}", e),
+    }
+}
+
 async fn load_input() -> Result<ScraperInput> {
     // Try to load from Apify input first
     if utils::is_on_apify() {
@@ -1,6 +1,14 @@
 use chrono::{DateTime, Utc};
+use serde::de::{self, Deserializer, Visitor};
 use serde::{Deserialize, Serialize};
 use std::collections::HashMap;
+use std::fmt;
+
+/// Columns emitted for CSV output; nested values are written as JSON
+pub const CSV_COLUMNS: [&str; 15] = [
+    "id", "title", "description", "price", "currency", "availability", "vendor",
+    "product_type", "tags", "images", "variants", "created_at", "updated_at", "handle", "url",
+];
 
 /// Canonical product data structure following the four immutable rules:
 /// 1. Language: English
@@ -25,21 +33,22 @@ pub struct ShopifyProduct {
     pub handle: String,
     pub url: String,
     
-    // Advanced data fields
+    // Advanced data fields. The larger ones are boxed: they are rarely populated,
+    // and inline they would add ~0.5KB to every product held in memory.
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub seo_data: Option<SeoData>,
+    pub seo_data: Option<Box<SeoData>>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub analytics_data: Option<AnalyticsData>,
+    pub analytics_data: Option<Box<AnalyticsData>>,
     #[serde(skip_serializing_if = "Option::is_none")]
     pub related_products: Option<Vec<String>>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub reviews: Option<ReviewsData>,
+    pub reviews: Option<Box<ReviewsData>>,
     #[serde(skip_serializing_if = "Option::is_none")]
     pub collections: Option<Vec<String>>,
     #[serde(skip_serializing_if = "Option::is_none")]
     pub custom_fields: Option<HashMap<String, String>>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub shipping_info: Option<ShippingInfo>,
+    pub shipping_info: Option<Box<ShippingInfo>>,
     #[serde(skip_serializing_if = "Option::is_none")]
     pub return_policy: Option<String>,
     #[serde(skip_serializing_if = "Option::is_none")]
@@ -60,6 +69,39 @@ pub struct ShopifyProduct {
     pub description_es: Option<String>,
 }
 
+impl ShopifyProduct {
+    /// Flatten into one CSV record in `CSV_COLUMNS` order
+    pub fn to_csv_record(&self) -> serde_json::Result<[String; 15]> {
+        Ok([
+            self.id.clone(),
+            self.title.clone(),
+            self.description.clone(),
+            self.price.to_string(),
+            self.currency.clone(),
+            self.availability.to_string(),
+            self.vendor.clone(),
+            self.product_type.clone(),
+            serde_json::to_string(&self.tags)?,
+            serde_json::to_string(&self.images)?,
+            serde_json::to_string(&self.variants)?,
+            self.created_at.to_rfc3339(),
+            self.updated_at.to_rfc3339(),
+            self.handle.clone(),
+            self.url.clone(),
+        ])
+    }
+}
+
+/// Render products as CSV (RFC 4180 quoting) with a header row
+pub fn products_to_csv(products: &[ShopifyProduct]) -> anyhow::Result<Vec<u8>> {
+    let mut writer = csv::Writer::from_writer(Vec::with_capacity(products.len() * 512));
+    writer.write_record(CSV_COLUMNS)?;
+    for product in products {
+        writer.write_record(&product.to_csv_record()?)?;
+    }
+    Ok(writer.into_inner().map_err(|e| e.into_error())?)
+}
+
 #[derive(Debug, Clone, Serialize, Deserialize)]
 pub struct ProductImage {
     pub src: String,
@@ -152,14 +194,27 @@ pub struct ShippingMethod {
     pub free_shipping: bool,
 }
 
+/// products.json listing page, decoded for discovery. Only handles are
+/// materialized; the rest of every product is skipped without being built.
+#[derive(Debug, Deserialize)]
+pub struct ProductListPage {
+    pub products: Option<Vec<ProductHandle>>,
+}
+
+#[derive(Debug, Deserialize)]
+pub struct ProductHandle {
+    pub handle: Option<String>,
+}
+
 /// Raw Shopify API response structure
 #[derive(Debug, Deserialize)]
 pub struct ShopifyApiResponse {
     pub product: RawShopifyProduct,
 }
 
+/// Only the fields read by the transform are declared; serde skips the rest
+/// (options, admin-only fields, ...) without materializing them.
 #[derive(Debug, Clone, Deserialize)]
-#[allow(dead_code)]
 pub struct RawShopifyProduct {
     pub id: u64,
     pub title: String,
@@ -173,7 +228,6 @@ pub struct RawShopifyProduct {
     pub handle: String,
     pub variants: Vec<RawProductVariant>,
     pub images: Vec<RawProductImage>,
-    pub options: Option<Vec<RawProductOption>>,
     pub metafields: Option<Vec<RawMetafield>>,
 }
 
@@ -181,7 +235,8 @@ pub struct RawShopifyProduct {
 pub struct RawProductVariant {
     pub id: u64,
     pub title: String,
-    pub price: String,
+    #[serde(deserialize_with = "deserialize_price")]
+    pub price: f64,
     pub sku: String,
     pub inventory_quantity: Option<i32>,
     pub available: Option<bool>,
@@ -191,7 +246,8 @@ pub struct RawProductVariant {
     pub option2: Option<String>,
     pub option3: Option<String>,
     pub barcode: Option<String>,
-    pub compare_at_price: Option<String>,
+    #[serde(default, deserialize_with = "deserialize_optional_price")]
+    pub compare_at_price: Option<f64>,
     pub fulfillment_service: Option<String>,
     pub inventory_management: Option<String>,
     pub inventory_policy: Option<String>,
@@ -200,6 +256,55 @@ pub struct RawProductVariant {
     pub tax_code: Option<String>,
 }
 
+/// Shopify sends prices as decimal strings ("19.99"). They are parsed straight
+/// from the JSON input, without an intermediate String per variant; values that
+/// do not parse become `None`.
+struct PriceVisitor;
+
+impl<'de> Visitor<'de> for PriceVisitor {
+    type Value = Option<f64>;
+
+    fn expecting(&self, formatter: &mut fmt::Formatter) -> fmt::Result {
+        formatter.write_str("a price as a decimal string or number")
+    }
+
+    fn visit_str<E: de::Error>(self, value: &str) -> Result<Self::Value, E> {
+        Ok(value.parse().ok())
+    }
+
+    fn visit_f64<E: de::Error>(self, value: f64) -> Result<Self::Value, E> {
+        Ok(Some(value))
+    }
+
+    fn visit_u64<E: de::Error>(self, value: u64) -> Result<Self::Value, E> {
+        Ok(Some(value as f64))
+    }
+
+    fn visit_i64<E: de::Error>(self, value: i64) -> Result<Self::Value, E> {
+        Ok(Some(value as f64))
+    }
+
+    fn visit_none<E: de::Error>(self) -> Result<Self::Value, E> {
+        Ok(None)
+    }
+
+    fn visit_unit<E: de::Error>(self) -> Result<Self::Value, E> {
+        Ok(None)
+    }
+
+    fn visit_some<D: Deserializer<'de>>(self, deserializer: D) -> Result<Self::Value, D::Error> {
+        deserializer.deserialize_any(PriceVisitor)
+    }
+}
+
+fn deserialize_price<'de, D: Deserializer<'de>>(deserializer: D) -> Result<f64, D::Error> {
+    Ok(deserializer.deserialize_any(PriceVisitor)?.unwrap_or(0.0))
+}
+
+fn deserialize_optional_price<'de, D: Deserializer<'de>>(deserializer: D) -> Result<Option<f64>, D::Error> {
+    deserializer.deserialize_option(PriceVisitor)
+}
+
 #[derive(Debug, Clone, Deserialize)]
 pub struct RawProductImage {
     pub src: String,
@@ -210,19 +315,47 @@ pub struct RawProductImage {
 }
 
 #[derive(Debug, Clone, Deserialize)]
-#[allow(dead_code)]
-pub struct RawProductOption {
-    pub id: u64,
-    pub name: String,
-    pub values: Vec<String>,
-}
-
-#[derive(Debug, Clone, Deserialize)]
-#[allow(dead_code)]
 pub struct RawMetafield {
-    pub id: u64,
     pub namespace: String,
     pub key: String,
     pub value: String,
-    pub value_type: String,
-}
\ No newline at end of file
+}
+
+impl From<RawProductVariant> for ProductVariant {
+    /// Move a raw variant into canonical form; prices were parsed while decoding
+    fn from(variant: RawProductVariant) -> Self {
+        Self {
+            id: variant.id.to_string(),
+            title: variant.title,
+            price: variant.price,
+            sku: variant.sku,
+            inventory_quantity: variant.inventory_quantity.unwrap_or(0),
+            available: variant.available.unwrap_or(false),
+            weight: variant.weight.unwrap_or(0.0),
+            weight_unit: variant.weight_unit.unwrap_or_else(|| "kg".to_string()),
+            option1: variant.option1,
+            option2: variant.option2,
+            option3: variant.option3,
+            barcode: variant.barcode,
+            compare_at_price: variant.compare_at_price,
+            fulfillment_service: variant.fulfillment_service,
+            inventory_management: variant.inventory_management,
+            inventory_policy: variant.inventory_policy,
+            requires_shipping: variant.requires_shipping,
+            taxable: variant.taxable,
+            tax_code: variant.tax_code,
+        }
+    }
+}
+
+impl From<RawProductImage> for ProductImage {
+    fn from(img: RawProductImage) -> Self {
+        Self {
+            src: img.src,
+            alt: img.alt,
+            width: img.width,
+            height: img.height,
+            position: img.position,
+        }
+    }
+}
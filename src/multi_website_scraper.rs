@@ -1,3 +1,4 @@
+use crate::dns::SHARED_RESOLVER;
 use crate::models::*;
 use crate::schema::*;
 use crate::data_wrangling::DataWranglingPipeline;
@@ -11,6 +12,11 @@ use tokio::sync::{Semaphore, RwLock};
 use tracing::{error, info, warn};
 use url::Url;
 use moka::future::Cache;
+use once_cell::sync::Lazy;
+use regex::Regex;
+
+/// Product handle pattern for sitemap discovery, compiled once
+static HANDLE_PATTERN: Lazy<Regex> = Lazy::new(|| Regex::new(r"/products/([^/]+)").unwrap());
 
 /// Cache entry for failed requests with retry information
 #[derive(Debug, Clone)]
@@ -103,9 +109,11 @@ impl MultiWebsiteScraper {
             .user_agent(&scraper_config.user_agent)
             .redirect(reqwest::redirect::Policy::limited(scraper_config.max_redirects))
             .pool_max_idle_per_host(50) // Increased connection pooling
+            .dns_resolver(SHARED_RESOLVER.clone())
             .pool_idle_timeout(Duration::from_secs(90))
             .gzip(true)
             .brotli(true)
+            .zstd(true)
             .danger_accept_invalid_certs(true) // For Docker environments with SSL issues
             .danger_accept_invalid_hostnames(true);
 
@@ -343,8 +351,7 @@ impl MultiWebsiteScraper {
                     }
                 } else if url.contains(".xml") {
                     if let Ok(content) = String::from_utf8(data) {
-                        let handle_pattern = regex::Regex::new(r"/products/([^/]+)")?;
-                        let handles: Vec<String> = handle_pattern
+                        let handles: Vec<String> = HANDLE_PATTERN
                             .captures_iter(&content)
                             .take(max_products)
                             .filter_map(|cap| cap.get(1))
@@ -485,9 +492,7 @@ impl MultiWebsiteScraper {
                     id: raw_product.id.to_string(),
                     title: raw_product.title,
                     description: raw_product.body_html.unwrap_or_default(),
-                    price: raw_product.variants.first()
-                        .and_then(|v| v.price.parse().ok())
-                        .unwrap_or(0.0),
+                    price: raw_product.variants.first().map_or(0.0, |v| v.price),
                     currency: "USD".to_string(),
                     availability: raw_product.available.unwrap_or(false),
                     vendor: raw_product.vendor,
@@ -497,36 +502,10 @@ impl MultiWebsiteScraper {
                         .filter(|s| !s.is_empty())
                         .collect(),
                     images: raw_product.images.into_iter()
-                        .map(|img| ProductImage {
-                            src: img.src,
-                            alt: img.alt,
-                            width: img.width,
-                            height: img.height,
-                            position: img.position,
-                        })
+                        .map(ProductImage::from)
                         .collect(),
                     variants: raw_product.variants.into_iter()
-                        .map(|v| ProductVariant {
-                            id: v.id.to_string(),
-                            title: v.title,
-                            price: v.price.parse().unwrap_or(0.0),
-                            sku: v.sku,
-                            inventory_quantity: v.inventory_quantity.unwrap_or(0),
-                            available: v.available.unwrap_or(false),
-                            weight: v.weight.unwrap_or(0.0),
-                            weight_unit: v.weight_unit.unwrap_or("kg".to_string()),
-                            option1: v.option1,
-                            option2: v.option2,
-                            option3: v.option3,
-                            barcode: v.barcode,
-                            compare_at_price: v.compare_at_price.and_then(|p| p.parse().ok()),
-                            fulfillment_service: v.fulfillment_service,
-                            inventory_management: v.inventory_management,
-                            inventory_policy: v.inventory_policy,
-                            requires_shipping: v.requires_shipping,
-                            taxable: v.taxable,
-                            tax_code: v.tax_code,
-                        })
+                        .map(ProductVariant::from)
                         .collect(),
                     created_at: raw_product.created_at,
                     updated_at: raw_product.updated_at,
@@ -1,42 +1,152 @@
+use crate::dns::SHARED_RESOLVER;
 use crate::models::*;
 use crate::schema::*;
 use anyhow::{anyhow, Result};
-use futures::future::join_all;
+use bytes::Bytes;
+use futures::stream::{self, StreamExt};
 use reqwest::Client;
 use regex::Regex;
 use std::sync::Arc;
+use std::sync::atomic::{AtomicUsize, Ordering};
 use std::time::{Duration, Instant};
 use std::collections::HashMap;
-use tokio::sync::{Semaphore, RwLock};
+use tokio::sync::{mpsc, oneshot, Semaphore, RwLock};
 use tracing::{error, info, warn, debug};
 use url::Url;
+use percent_encoding::percent_decode_str;
 use once_cell::sync::Lazy;
+use parking_lot::Mutex;
+use moka::future::Cache;
+use moka::Expiry;
+use rand::Rng;
 
 /// Global regex patterns for performance
 static HANDLE_PATTERN: Lazy<Regex> = Lazy::new(|| Regex::new(r"/products/([^/]+)").unwrap());
+// <p ...>, </p> and <br>, <br/>, <br /> in one pass (but not <pre>, <param>, ...)
+static PARAGRAPH_BREAK_PATTERN: Lazy<Regex> = Lazy::new(|| Regex::new(r"(?i)</?(p|br)\b[^>]*>").unwrap());
+// Matches myshopify.com and cdn.shopify.com too; case-insensitive so the domain is not lowercased first
+static SHOPIFY_DOMAIN_PATTERN: Lazy<Regex> = Lazy::new(|| Regex::new(r"(?i)shopify").unwrap());
+
+/// Batches at least this large decode and transform products on the rayon pool
+const OFFLOAD_THRESHOLD: usize = 32;
+
+/// How long a 404 is remembered (capped by the configured cache TTL)
+const NOT_FOUND_TTL: Duration = Duration::from_secs(60);
+
+/// Longest we wait before retrying a fetch, whatever the backoff or Retry-After says
+const MAX_RETRY_DELAY: Duration = Duration::from_secs(60);
+
+/// Upper bound on cached product bodies, in bytes. Discovery already dedups
+/// handles, so the cache is mostly there to coalesce in-flight fetches and
+/// remember 404s; it is kept small so a run does not hold on to raw JSON.
+const PRODUCT_CACHE_BYTES: u64 = 8 * 1024 * 1024;
+
+/// Product body keyed by product.json URL; `None` records a 404
+type ProductCache = Cache<String, Option<Bytes>>;
+
+/// Cached bodies live for the configured TTL, cached 404s only briefly
+struct ProductCacheExpiry {
+    ttl: Duration,
+    not_found_ttl: Duration,
+}
+
+impl Expiry<String, Option<Bytes>> for ProductCacheExpiry {
+    fn expire_after_create(&self, _key: &String, value: &Option<Bytes>, _created_at: std::time::Instant) -> Option<Duration> {
+        Some(if value.is_some() { self.ttl } else { self.not_found_ttl })
+    }
+}
+
+/// A store resolved once per scrape: normalized domain and products base URL
+#[derive(Debug, Clone)]
+struct StoreTarget {
+    domain: String,
+    products_url: Url,
+}
 
 /// High-performance parallel Shopify product scraper
 pub struct ShopifyScraper {
     client: Client,
     semaphore: Arc<Semaphore>,
+    // Current number of permits the semaphore is meant to hold
+    concurrency_limit: Arc<AtomicUsize>,
+    // Successful fetches since concurrency was last changed by throttling
+    successes: Arc<AtomicUsize>,
+    // When concurrency was last halved because of a 429
+    last_throttled: Arc<Mutex<Option<Instant>>>,
     timeout: Duration,
-    config: ScraperConfig,
+    config: Arc<ScraperConfig>,
     domain_limits: Arc<RwLock<HashMap<String, Instant>>>,
+    // Fetched products (and 404s), so repeated handles are not fetched again
+    product_cache: ProductCache,
 }
 
 impl ShopifyScraper {
     /// Create a new scraper instance with advanced configuration
     pub fn new(input: ScraperInput) -> Result<Self> {
-        let config = ScraperConfig {
-            input: input.clone(),
-            user_agent: "ShopifyLightningScraper/1.0 (Rust)".to_string(),
+        let config = Self::scraper_config(input);
+        let client = Self::build_client(&config)?;
+        Ok(Self::with_config(config, client))
+    }
+
+    /// Create a scraper that sends its requests through `client`, so several
+    /// scrapers can share one connection pool (clones of a scraper already do).
+    /// Pooled connections belong to the Tokio runtime that opened them, so only
+    /// share a client between scrapers running on the same runtime.
+    #[allow(dead_code)]
+    pub fn with_client(input: ScraperInput, client: Client) -> Self {
+        Self::with_config(Self::scraper_config(input), client)
+    }
+
+    fn scraper_config(input: ScraperInput) -> ScraperConfig {
+        ScraperConfig {
             rate_limit_delay: input.caching.rate_limit_per_domain_ms, // Use input setting
+            input,
+            user_agent: "ShopifyLightningScraper/1.0 (Rust)".to_string(),
             max_redirects: 5,
-        };
+        }
+    }
 
+    fn with_config(config: ScraperConfig, client: Client) -> Self {
+        let input = &config.input;
+        let semaphore = Arc::new(Semaphore::new(input.max_concurrent));
+
+        // A disabled kind of caching still coalesces concurrent fetches of a handle,
+        // it just expires immediately
+        let caching = &input.caching;
+        let ttl = Duration::from_secs(caching.cache_ttl_seconds);
+        let product_cache = Cache::builder()
+            .max_capacity(PRODUCT_CACHE_BYTES)
+            .weigher(|_url: &String, body: &Option<Bytes>| {
+                body.as_ref().map_or(1, |body| body.len().try_into().unwrap_or(u32::MAX))
+            })
+            .expire_after(ProductCacheExpiry {
+                ttl: if caching.enable_response_caching { ttl } else { Duration::ZERO },
+                not_found_ttl: if caching.enable_failure_caching { NOT_FOUND_TTL.min(ttl) } else { Duration::ZERO },
+            })
+            .build();
+
+        Self {
+            client,
+            semaphore,
+            concurrency_limit: Arc::new(AtomicUsize::new(input.max_concurrent)),
+            successes: Arc::new(AtomicUsize::new(0)),
+            last_throttled: Arc::new(Mutex::new(None)),
+            timeout: Duration::from_secs(input.timeout_seconds),
+            domain_limits: Arc::new(RwLock::new(HashMap::new())),
+            product_cache,
+            config: Arc::new(config),
+        }
+    }
+
+    /// Build an HTTP client; HTTP/2 is negotiated via ALPN where the store supports it
+    fn build_client(config: &ScraperConfig) -> Result<Client> {
+        let input = &config.input;
         let mut client_builder = Client::builder()
             .user_agent(&config.user_agent)
             .redirect(reqwest::redirect::Policy::limited(config.max_redirects))
+            .dns_resolver(SHARED_RESOLVER.clone()) // Resolve each store once, not per connection
+            .pool_idle_timeout(Duration::from_secs(90))
+            .tcp_keepalive(Duration::from_secs(60))
             .danger_accept_invalid_certs(true) // For Docker environments with SSL issues
             .danger_accept_invalid_hostnames(true);
 
@@ -45,25 +155,132 @@ impl ShopifyScraper {
             client_builder = client_builder.timeout(Duration::from_secs(input.timeout_seconds));
         }
 
-        // Apply performance optimizations
+        // Apply performance optimizations. Keep as many idle connections per host as
+        // we run fetches: single-store scrapes would otherwise churn connections
+        // past the pool size. Over HTTP/2 the adaptive window lets each multiplexed
+        // stream use the connection's bandwidth.
         if input.performance.enable_connection_pooling {
-            client_builder = client_builder.pool_max_idle_per_host(20);
+            client_builder = client_builder
+                .pool_max_idle_per_host(input.max_concurrent.max(1))
+                .http2_adaptive_window(true);
         }
 
-        if input.performance.enable_compression {
-            client_builder = client_builder.gzip(true).brotli(true);
+        // Advertise br, zstd and gzip, decoded transparently; product JSON (body_html
+        // especially) compresses well. Left off entirely when compression is disabled.
+        let compression = input.performance.enable_compression;
+        client_builder = client_builder.gzip(compression).brotli(compression).zstd(compression);
+
+        Ok(client_builder.build()?)
+    }
+
+    /// Resize the number of concurrent product fetches at runtime, between 1 and
+    /// `input.max_concurrent` (the batch pipeline never has more requests in flight).
+    /// Must be called from within a Tokio runtime.
+    pub fn set_concurrency(&self, limit: usize) {
+        let limit = limit.clamp(1, self.config.input.max_concurrent.max(1));
+        let previous = self.concurrency_limit.swap(limit, Ordering::SeqCst);
+        self.resize_permits(previous, limit);
+    }
+
+    /// Add or retire semaphore permits after the limit moved from `previous` to `limit`
+    fn resize_permits(&self, previous: usize, limit: usize) {
+        if limit > previous {
+            self.semaphore.add_permits(limit - previous);
+        } else if limit < previous {
+            // Retire the excess permits as in-flight fetches hand them back
+            let semaphore = self.semaphore.clone();
+            let excess = (previous - limit) as u32;
+            tokio::spawn(async move {
+                if let Ok(permits) = semaphore.acquire_many_owned(excess).await {
+                    permits.forget();
+                }
+            });
         }
+    }
 
-        let client = client_builder.build()?;
-        let semaphore = Arc::new(Semaphore::new(input.max_concurrent));
+    /// Current concurrency limit
+    pub fn concurrency(&self) -> usize {
+        self.concurrency_limit.load(Ordering::SeqCst)
+    }
 
-        Ok(Self {
-            client,
-            semaphore,
-            timeout: Duration::from_secs(input.timeout_seconds),
-            config,
-            domain_limits: Arc::new(RwLock::new(HashMap::new())),
-        })
+    /// Concurrency follows AIMD (additive increase, multiplicative decrease): a
+    /// throttling episode halves the limit once, and every `concurrency()`
+    /// successful fetches (one full round at the current limit) add one permit
+    /// back, up to `max_concurrent`.
+    ///
+    /// A 429 from a request sent before the last cut belongs to the episode we
+    /// already reacted to, so it does not halve the limit again.
+    fn on_throttled(&self, sent_at: Instant) {
+        let mut last_throttled = self.last_throttled.lock();
+        if last_throttled.map_or(false, |cut| sent_at < cut) {
+            return;
+        }
+        *last_throttled = Some(Instant::now());
+
+        // Halve whatever the limit is at this moment, in one atomic step, so a
+        // concurrent raise or cut cannot be overwritten with a stale value
+        self.successes.store(0, Ordering::SeqCst);
+        let previous = self
+            .concurrency_limit
+            .fetch_update(Ordering::SeqCst, Ordering::SeqCst, |limit| Some((limit / 2).max(1)))
+            .unwrap_or_else(|limit| limit);
+        let limit = (previous / 2).max(1);
+        self.resize_permits(previous, limit);
+        info!("Reduced concurrency to {}", limit);
+    }
+
+    /// Additive half of AIMD: one more permit per full round of successful fetches
+    fn on_success(&self) {
+        let max_concurrent = self.config.input.max_concurrent.max(1);
+        let limit = self.concurrency();
+        let successes = self.successes.fetch_add(1, Ordering::SeqCst) + 1;
+        if limit < max_concurrent
+            && successes >= limit
+            && self.successes.compare_exchange(successes, 0, Ordering::SeqCst, Ordering::SeqCst).is_ok()
+        {
+            // Only raise from the limit we read; if a cut happened in between, it wins
+            if self
+                .concurrency_limit
+                .compare_exchange(limit, limit + 1, Ordering::SeqCst, Ordering::SeqCst)
+                .is_ok()
+            {
+                self.resize_permits(limit, limit + 1);
+                debug!("Raised concurrency to {}", limit + 1);
+            }
+        }
+    }
+
+    /// Delay before retry number `attempt` (0-based): exponential (or linear) in the
+    /// configured base delay plus random jitter, unless the server sent Retry-After
+    fn retry_delay(&self, attempt: u32, retry_after: Option<Duration>) -> Duration {
+        if let Some(delay) = retry_after {
+            return delay.min(MAX_RETRY_DELAY);
+        }
+
+        let caching = &self.config.input.caching;
+        let base = caching.retry_delay_ms;
+        let backoff = if caching.enable_exponential_backoff {
+            base.saturating_mul(1 << attempt.min(16))
+        } else {
+            base.saturating_mul(attempt as u64 + 1)
+        };
+        let jitter = rand::thread_rng().gen_range(0..=base);
+
+        Duration::from_millis(backoff.saturating_add(jitter)).min(MAX_RETRY_DELAY)
+    }
+
+    /// Read a Retry-After header given either in seconds (possibly fractional,
+    /// e.g. Shopify's `2.0`) or as an HTTP date
+    fn retry_after(response: &reqwest::Response) -> Option<Duration> {
+        let value = response.headers().get(reqwest::header::RETRY_AFTER)?.to_str().ok()?.trim();
+        if let Ok(seconds) = value.parse::<f64>() {
+            if !seconds.is_finite() || seconds < 0.0 {
+                return None;
+            }
+            return Duration::try_from_secs_f64(seconds).ok();
+        }
+        let date = chrono::DateTime::parse_from_rfc2822(value).ok()?;
+        (date.with_timezone(&chrono::Utc) - chrono::Utc::now()).to_std().ok()
     }
 
     /// Check if we should rate limit requests to a domain
@@ -92,10 +309,7 @@ impl ShopifyScraper {
 
     /// Check if domain appears to be a Shopify store
     fn is_shopify_store(&self, domain: &str) -> bool {
-        let domain_lower = domain.to_lowercase();
-        domain_lower.contains("myshopify.com") || 
-        domain_lower.contains("shopify") ||
-        domain_lower.contains("cdn.shopify.com")
+        SHOPIFY_DOMAIN_PATTERN.is_match(domain)
     }
 
     /// Apply product filters
@@ -160,16 +374,58 @@ impl ShopifyScraper {
         true
     }
 
-    /// Fetch product data from Shopify product.json endpoint with retries
-    async fn fetch_product_data(&self, domain: &str, product_handle: &str) -> Result<Option<RawShopifyProduct>> {
+    /// Normalize the domain and build its products URL once for a whole scrape
+    fn prepare_store(&self, domain: &str) -> Result<StoreTarget> {
+        let domain = self.normalize_domain(domain)?;
+        if !self.is_shopify_store(&domain) {
+            debug!("{} does not look like a Shopify domain, assuming a custom storefront", domain);
+        }
+        let products_url = Self::products_base_url(&domain)?;
+        Ok(StoreTarget { domain, products_url })
+    }
+
+    /// Base `{domain}/products` URL, parsed once per scrape; handles are appended to it
+    fn products_base_url(domain: &str) -> Result<Url> {
+        let mut url = Url::parse(domain)?;
+        url.path_segments_mut()
+            .map_err(|_| anyhow!("Invalid store URL: {}", domain))?
+            .pop_if_empty()
+            .push("products");
+        Ok(url)
+    }
+
+    /// `{products_url}/{handle}.json`, with the handle percent-encoded as a single path segment.
+    /// Handles copied from storefront URLs may already be encoded; they are decoded
+    /// first so they are not encoded twice.
+    fn product_json_url(products_url: &Url, product_handle: &str) -> Url {
+        let handle = percent_decode_str(product_handle)
+            .decode_utf8()
+            .unwrap_or(std::borrow::Cow::Borrowed(product_handle));
+        let mut url = products_url.clone();
+        if let Ok(mut segments) = url.path_segments_mut() {
+            segments.push(&format!("{}.json", handle));
+        }
+        url
+    }
+
+    /// Fetch the raw product.json body, served from the product cache when possible.
+    /// Concurrent fetches of the same handle share one request.
+    async fn fetch_product_data(&self, products_url: &Url, product_handle: &str) -> Result<Option<Bytes>> {
+        let url = Self::product_json_url(products_url, product_handle);
+        self.product_cache
+            .try_get_with(url.to_string(), self.fetch_product_uncached(url, product_handle))
+            .await
+            .map_err(|e| anyhow!("{:#}", e))
+    }
+
+    /// Fetch the raw product.json body from Shopify with retries
+    async fn fetch_product_uncached(&self, url: Url, product_handle: &str) -> Result<Option<Bytes>> {
         let _permit = self.semaphore.acquire().await?;
         
         // Rate limiting per domain
-        if self.should_rate_limit(domain).await {
+        if self.should_rate_limit(url.host_str().unwrap_or_default()).await {
             tokio::time::sleep(Duration::from_millis(self.config.rate_limit_delay)).await;
         }
-        
-        let url = format!("{}/products/{}.json", domain, product_handle);
 
         let mut attempts = 0;
         let max_attempts = if self.config.input.performance.enable_retries {
@@ -179,14 +435,14 @@ impl ShopifyScraper {
         };
 
         while attempts < max_attempts {
-            match self.client.get(&url).send().await {
+            let sent_at = Instant::now();
+            let retry_after = match self.client.get(url.clone()).send().await {
                 Ok(response) => {
                     match response.status() {
                         reqwest::StatusCode::OK => {
-                            let api_response: ShopifyApiResponse = response.json().await?;
-                            let product = api_response.product;
-                            
-                            return Ok(Some(product));
+                            let body = response.bytes().await?;
+                            self.on_success();
+                            return Ok(Some(body));
                         }
                         reqwest::StatusCode::NOT_FOUND => {
                             warn!("Product not found: {}", product_handle);
@@ -194,14 +450,18 @@ impl ShopifyScraper {
                         }
                         reqwest::StatusCode::TOO_MANY_REQUESTS => {
                             warn!("Rate limited for {}", product_handle);
-                            if attempts < max_attempts - 1 {
-                                tokio::time::sleep(Duration::from_millis(
-                                    1000 * (attempts + 1) as u64
-                                )).await;
-                                attempts += 1;
-                                continue;
+                            self.on_throttled(sent_at);
+                            if attempts == max_attempts - 1 {
+                                return Err(anyhow!("Rate limited"));
                             }
-                            return Err(anyhow!("Rate limited"));
+                            Self::retry_after(&response)
+                        }
+                        status if status.is_server_error() => {
+                            warn!("HTTP {} for {}", status, url);
+                            if attempts == max_attempts - 1 {
+                                return Err(anyhow!("HTTP error: {}", status));
+                            }
+                            Self::retry_after(&response)
                         }
                         status => {
                             error!("HTTP {} for {}", status, url);
@@ -211,16 +471,15 @@ impl ShopifyScraper {
                 }
                 Err(e) => {
                     error!("Error fetching {}: {}", product_handle, e);
-                    if attempts < max_attempts - 1 {
-                        tokio::time::sleep(Duration::from_millis(
-                            1000 * (attempts + 1) as u64
-                        )).await;
-                        attempts += 1;
-                        continue;
+                    if attempts == max_attempts - 1 {
+                        return Err(anyhow!("Request failed: {}", e));
                     }
-                    return Err(anyhow!("Request failed: {}", e));
+                    None
                 }
-            }
+            };
+
+            tokio::time::sleep(self.retry_delay(attempts, retry_after)).await;
+            attempts += 1;
         }
 
         Err(anyhow!("Max retries exceeded"))
@@ -231,60 +490,29 @@ impl ShopifyScraper {
         // Extract basic product information
         let id = raw_product.id.to_string();
         let title = raw_product.title;
-        let description = raw_product.body_html
-            .unwrap_or_default()
-            .replace("<p>", "")
-            .replace("</p>", "")
-            .replace("<br>", "\n")
-            .replace("<br/>", "\n")
-            .replace("<br />", "\n");
-
-        // Handle pricing from first variant
-        let (price, currency) = if let Some(variant) = raw_product.variants.first() {
-            let price: f64 = variant.price.parse().unwrap_or(0.0);
-            (price, "USD".to_string()) // Shopify typically uses USD
-        } else {
-            (0.0, "USD".to_string())
-        };
+        let body_html = raw_product.body_html.unwrap_or_default();
+        let description = PARAGRAPH_BREAK_PATTERN
+            .replace_all(&body_html, |caps: &regex::Captures| {
+                if caps[1].eq_ignore_ascii_case("br") { "\n" } else { "" }
+            })
+            .into_owned();
 
         // Extract images with enhanced data
         let images: Vec<ProductImage> = raw_product.images
             .into_iter()
-            .map(|img| ProductImage {
-                src: img.src,
-                alt: img.alt,
-                width: img.width,
-                height: img.height,
-                position: img.position,
-            })
+            .map(ProductImage::from)
             .collect();
 
         // Transform variants to canonical format
         let variants: Vec<ProductVariant> = raw_product.variants
             .into_iter()
-            .map(|variant| ProductVariant {
-                id: variant.id.to_string(),
-                title: variant.title,
-                price: variant.price.parse().unwrap_or(0.0),
-                sku: variant.sku,
-                inventory_quantity: variant.inventory_quantity.unwrap_or(0),
-                available: variant.available.unwrap_or(false),
-                weight: variant.weight.unwrap_or(0.0),
-                weight_unit: variant.weight_unit.unwrap_or("kg".to_string()),
-                option1: variant.option1,
-                option2: variant.option2,
-                option3: variant.option3,
-                barcode: variant.barcode,
-                compare_at_price: variant.compare_at_price.and_then(|p| p.parse().ok()),
-                fulfillment_service: variant.fulfillment_service,
-                inventory_management: variant.inventory_management,
-                inventory_policy: variant.inventory_policy,
-                requires_shipping: variant.requires_shipping,
-                taxable: variant.taxable,
-                tax_code: variant.tax_code,
-            })
+            .map(ProductVariant::from)
             .collect();
 
+        // Handle pricing from first variant (already parsed above)
+        let price = variants.first().map_or(0.0, |variant| variant.price);
+        let currency = "USD".to_string(); // Shopify typically uses USD
+
         // Parse tags
         let tags: Vec<String> = raw_product.tags
             .split(',')
@@ -339,15 +567,41 @@ impl ShopifyScraper {
         })
     }
 
+    /// Decode a product.json body and transform it to canonical format
+    fn parse_and_transform(&self, body: &[u8], domain: &str) -> Result<ShopifyProduct> {
+        let api_response: ShopifyApiResponse = serde_json::from_slice(body)?;
+        self.transform_to_canonical(api_response.product, domain)
+    }
+
+    /// Decode and transform a product body, on the rayon pool when `offload` is set
+    /// so CPU-bound work stays off the async worker threads
+    async fn transform_body(&self, body: Bytes, domain: &str, offload: bool) -> Result<ShopifyProduct> {
+        if !offload {
+            return self.parse_and_transform(&body, domain);
+        }
+
+        let scraper = self.clone();
+        let domain = domain.to_string();
+        let (tx, rx) = oneshot::channel();
+        rayon::spawn(move || {
+            let _ = tx.send(scraper.parse_and_transform(&body, &domain));
+        });
+        rx.await?
+    }
+
     /// Scrape a single product and return canonical format
+    #[allow(dead_code)]
     pub async fn scrape_product(&self, domain: &str, product_handle: &str) -> Result<Option<ShopifyProduct>> {
-        let domain = self.normalize_domain(domain)?;
-
-        // Skip Shopify store detection warning for custom domains
+        let store = self.prepare_store(domain)?;
+        self.scrape_store_product(&store, product_handle).await
+    }
 
-        match self.fetch_product_data(&domain, product_handle).await? {
-            Some(raw_data) => {
-                let canonical = self.transform_to_canonical(raw_data, &domain)?;
+    /// Scrape a single product from an already prepared store
+    #[allow(dead_code)]
+    async fn scrape_store_product(&self, store: &StoreTarget, product_handle: &str) -> Result<Option<ShopifyProduct>> {
+        match self.fetch_product_data(&store.products_url, product_handle).await? {
+            Some(body) => {
+                let canonical = self.parse_and_transform(&body, &store.domain)?;
                 if self.apply_filters(&canonical) {
                     Ok(Some(canonical))
                 } else {
@@ -359,43 +613,122 @@ impl ShopifyScraper {
         }
     }
 
-    /// Scrape multiple products in parallel
+    /// Scrape multiple products in parallel. Products are returned in the order
+    /// of `product_handles`.
+    #[allow(dead_code)]
     pub async fn scrape_multiple_products(&self, domain: &str, product_handles: Vec<String>) -> Result<Vec<ShopifyProduct>> {
-        let domain = self.normalize_domain(domain)?;
+        let store = self.prepare_store(domain)?;
+        let max_concurrent = self.config.input.max_concurrent.max(1);
+        let (product_tx, mut product_rx) = mpsc::channel(2 * max_concurrent);
 
+        let collect = async {
+            let mut products = Vec::new();
+            while let Some(indexed) = product_rx.recv().await {
+                products.push(indexed);
+            }
+            products
+        };
+        let pipeline = self.run_pipeline(store, product_handles, product_tx, |index, product| (index, product));
+        let ((), mut products) = tokio::join!(pipeline, collect);
+
+        products.sort_unstable_by_key(|(index, _)| *index);
+        Ok(products.into_iter().map(|(_, product)| product).collect())
+    }
+
+    /// Scrape multiple products in parallel, yielding each product as soon as it
+    /// is ready so callers can start writing output while fetches are in flight.
+    /// Products arrive in completion order, not in the order of `product_handles`.
+    pub fn scrape_products_stream(&self, domain: &str, product_handles: Vec<String>) -> Result<mpsc::Receiver<ShopifyProduct>> {
+        let store = self.prepare_store(domain)?;
+        let max_concurrent = self.config.input.max_concurrent.max(1);
+        let (product_tx, product_rx) = mpsc::channel(2 * max_concurrent);
+
+        let scraper = self.clone();
+        tokio::spawn(async move {
+            scraper.run_pipeline(store, product_handles, product_tx, |_, product| product).await;
+        });
+
+        Ok(product_rx)
+    }
+
+    /// Fetching and transforming run as two pipelined stages joined by a bounded
+    /// queue, so transform work overlaps with in-flight requests. Large batches
+    /// decode and transform in parallel on the rayon pool. `emit` wraps each product
+    /// with the index of its handle before it is sent.
+    async fn run_pipeline<T>(
+        &self,
+        store: StoreTarget,
+        product_handles: Vec<String>,
+        product_tx: mpsc::Sender<T>,
+        emit: fn(usize, ShopifyProduct) -> T,
+    ) {
+        let StoreTarget { domain, products_url } = store;
         info!("Scraping {} products from {}", product_handles.len(), domain);
         let start_time = std::time::Instant::now();
 
-        // Create tasks for parallel execution
-        let tasks: Vec<_> = product_handles
-            .into_iter()
-            .map(|handle| {
-                let scraper = self.clone();
-                let domain = domain.clone();
-                tokio::spawn(async move {
-                    scraper.scrape_product(&domain, &handle).await
-                })
+        let max_concurrent = self.config.input.max_concurrent.max(1);
+        let offload = product_handles.len() >= OFFLOAD_THRESHOLD;
+        let (raw_tx, raw_rx) = mpsc::channel::<(usize, Bytes)>(2 * max_concurrent);
+
+        // Fetch stage: at most `max_concurrent` requests in flight
+        let fetcher = {
+            let scraper = self.clone();
+            tokio::spawn(async move {
+                let scraper = &scraper;
+                let products_url = &products_url;
+                let mut fetches = stream::iter(product_handles.into_iter().enumerate())
+                    .map(|(index, handle)| async move {
+                        let result = scraper.fetch_product_data(products_url, &handle).await;
+                        (index, handle, result)
+                    })
+                    .buffer_unordered(max_concurrent);
+
+                while let Some((index, handle, result)) = fetches.next().await {
+                    match result {
+                        Ok(Some(body)) => {
+                            if raw_tx.send((index, body)).await.is_err() {
+                                break; // Transform stage is gone
+                            }
+                        }
+                        Ok(None) => {} // Product not found, skip
+                        Err(e) => error!("Scraping error for {}: {}", handle, e),
+                    }
+                }
             })
-            .collect();
+        };
 
-        // Execute all tasks in parallel
-        let results = join_all(tasks).await;
+        // Transform stage: drain the queue as products arrive
+        let workers = if offload { rayon::current_num_threads() } else { 1 };
+        let bodies = stream::unfold(raw_rx, |mut rx| async move {
+            rx.recv().await.map(|item| (item, rx))
+        });
+        let domain = &domain;
+        let mut transformed = bodies
+            .map(|(index, body)| async move { (index, self.transform_body(body, domain, offload).await) })
+            .buffer_unordered(workers);
 
-        // Filter out None results and errors
-        let mut products = Vec::new();
-        for result in results {
+        let mut scraped = 0;
+        while let Some((index, result)) = transformed.next().await {
             match result {
-                Ok(Ok(Some(product))) => products.push(product),
-                Ok(Ok(None)) => {} // Product not found or filtered out, skip
-                Ok(Err(e)) => error!("Scraping error: {}", e),
-                Err(e) => error!("Task error: {}", e),
+                Ok(product) if self.apply_filters(&product) => {
+                    if product_tx.send(emit(index, product)).await.is_err() {
+                        break; // Consumer is gone
+                    }
+                    scraped += 1;
+                }
+                Ok(product) => debug!("Product {} filtered out", product.handle),
+                Err(e) => error!("Transform error: {}", e),
             }
         }
 
-        let elapsed = start_time.elapsed();
-        info!("Scraped {} products in {:.3} seconds", products.len(), elapsed.as_secs_f64());
+        // Closes the raw queue so the fetch stage stops if we left early
+        drop(transformed);
+        if let Err(e) = fetcher.await {
+            error!("Task error: {}", e);
+        }
 
-        Ok(products)
+        let elapsed = start_time.elapsed();
+        info!("Scraped {} products in {:.3} seconds", scraped, elapsed.as_secs_f64());
     }
 
     /// Discover product handles from Shopify store with parallel pagination
@@ -408,6 +741,14 @@ impl ShopifyScraper {
         let enable_pagination = self.config.input.pagination.enable_pagination;
         
         info!("Pagination config: limit={}, page={}, enable_pagination={}", limit, page, enable_pagination);
+
+        // Never look past the pages needed to reach max_products (0 = no cap)
+        let pages_needed = if max_products > 0 { (max_products + limit.max(1) - 1) / limit.max(1) } else { 0 };
+        let page_cap = match (self.config.input.pagination.max_pages, pages_needed) {
+            (0, needed) => needed,
+            (max_pages, 0) => max_pages,
+            (max_pages, needed) => std::cmp::min(max_pages, needed),
+        };
         
         let urls_to_try = if enable_pagination {
             vec![
@@ -428,29 +769,30 @@ impl ShopifyScraper {
                     info!("URL contains .json: {}", url.contains(".json"));
                     if url.contains(".json") {
                         // First, discover total number of pages by checking first page
-                        let response_text = match response.text().await {
-                            Ok(text) => {
-                                info!("Got response text for {}, length: {}", url, text.len());
-                                text
+                        // Parse straight from the raw body; skips the charset decode into a String
+                        let response_body = match response.bytes().await {
+                            Ok(body) => {
+                                info!("Got response body for {}, length: {}", url, body.len());
+                                body
                             }
                             Err(e) => {
-                                warn!("Failed to get response text for {}: {}", url, e);
+                                warn!("Failed to get response body for {}: {}", url, e);
                                 continue;
                             }
                         };
                         
-                        let first_page_data = match serde_json::from_str::<serde_json::Value>(&response_text) {
+                        let first_page_data = match serde_json::from_slice::<ProductListPage>(&response_body) {
                             Ok(data) => {
                                 info!("Parsed JSON response for {}", url);
                                 data
                             }
                             Err(e) => {
                                 warn!("Failed to parse JSON for {}: {}", url, e);
-                                warn!("Response text preview: {}", &response_text[..std::cmp::min(200, response_text.len())]);
+                                warn!("Response body preview: {}", String::from_utf8_lossy(&response_body[..std::cmp::min(200, response_body.len())]));
                                 continue; // Try next URL
                             }
                         };
-                        if let Some(first_products) = first_page_data.get("products").and_then(|p| p.as_array()) {
+                        if let Some(first_products) = first_page_data.products {
                             info!("Found products array with {} products", first_products.len());
                             if first_products.is_empty() {
                                 warn!("Products array is empty for {}, trying next URL", url);
@@ -459,9 +801,11 @@ impl ShopifyScraper {
                             
                             // Determine total pages by checking if we got a full page
                             let mut total_pages = 1;
-                            if first_products.len() == limit { // Full page, likely more pages exist
+                            if first_products.len() == limit && page_cap == 1 {
+                                info!("First page has {} products, page cap reached, not checking for more pages", limit);
+                            } else if first_products.len() == limit { // Full page, likely more pages exist
                                 info!("First page has {} products, checking for more pages...", limit);
-                                total_pages = self.discover_total_pages(&domain, &url, limit).await.unwrap_or(1);
+                                total_pages = self.discover_total_pages(&domain, &url, limit, page_cap).await.unwrap_or(1);
                             } else {
                                 info!("First page has {} products, likely the only page", first_products.len());
                             }
@@ -470,54 +814,29 @@ impl ShopifyScraper {
                             
                             // Create parallel tasks for all pages
                             let mut page_tasks = Vec::new();
-                            let max_pages = if self.config.input.pagination.max_pages > 0 {
-                                std::cmp::min(total_pages, self.config.input.pagination.max_pages)
+                            let max_pages = if page_cap > 0 {
+                                std::cmp::min(total_pages, page_cap)
                             } else {
                                 total_pages
                             };
+
+                            // The first request already returned page 1 unless a later start
+                            // page was configured; reuse its handles instead of fetching it again
+                            let mut all_handles = Vec::new();
+                            let mut first_page_num = 1;
+                            if !enable_pagination || page <= 1 {
+                                all_handles.extend(first_products.into_iter().filter_map(|p| p.handle));
+                                first_page_num = 2;
+                            }
                             
-                            for page_num in 1..=max_pages {
+                            for page_num in first_page_num..=max_pages {
                                 let client = self.client.clone();
                                 let page_url = format!("{}/products.json?page={}&limit={}", domain, page_num, limit);
                                 
-                                page_tasks.push(tokio::spawn(async move {
-                                    match client.get(&page_url).send().await {
-                                        Ok(response) if response.status() == reqwest::StatusCode::OK => {
-                                            match response.json::<serde_json::Value>().await {
-                                                Ok(data) => {
-                                                    if let Some(products) = data.get("products").and_then(|p| p.as_array()) {
-                                                        let handles: Vec<String> = products
-                                                            .iter()
-                                                            .filter_map(|p| p.get("handle").and_then(|h| h.as_str()))
-                                                            .map(|s| s.to_string())
-                                                            .collect();
-                                                        debug!("Page {} returned {} products", page_num, handles.len());
-                                                        Ok(handles)
-                                                    } else {
-                                                        debug!("Page {} has no products array", page_num);
-                                                        Ok(Vec::new())
-                                                    }
-                                                }
-                                                Err(e) => {
-                                                    warn!("Failed to parse JSON for page {}: {}", page_num, e);
-                                                    Err(e)
-                                                }
-                                            }
-                                        }
-                                        Ok(response) => {
-                                            debug!("Page {} returned status: {}", page_num, response.status());
-                                            Ok(Vec::new()) // Non-200 status
-                                        }
-                                        Err(e) => {
-                                            warn!("Failed to fetch page {}: {}", page_num, e);
-                                            Err(e.into())
-                                        }
-                                    }
-                                }));
+                                page_tasks.push(tokio::spawn(Self::fetch_page_handles(client, page_url, page_num)));
                             }
                             
                             // Collect results from all parallel tasks
-                            let mut all_handles = Vec::new();
                             for task in page_tasks {
                                 match task.await {
                                     Ok(Ok(handles)) => {
@@ -535,6 +854,33 @@ impl ShopifyScraper {
                             // Remove duplicates and limit if needed
                             all_handles.sort();
                             all_handles.dedup();
+
+                            // The page cap assumes every page holds `limit` unique handles; if
+                            // duplicates left us short, keep paging until we have enough
+                            let mut pages_fetched = max_pages;
+                            let max_pages_setting = self.config.input.pagination.max_pages;
+                            let more_pages = page_cap > 0 && total_pages >= page_cap;
+                            while more_pages
+                                && all_handles.len() < max_products
+                                && (max_pages_setting == 0 || pages_fetched < max_pages_setting)
+                                && pages_fetched < 1000
+                            {
+                                let page_num = pages_fetched + 1;
+                                let page_url = format!("{}/products.json?page={}&limit={}", domain, page_num, limit);
+                                match Self::fetch_page_handles(self.client.clone(), page_url, page_num).await {
+                                    Ok(handles) if !handles.is_empty() => {
+                                        all_handles.extend(handles);
+                                        all_handles.sort();
+                                        all_handles.dedup();
+                                    }
+                                    Ok(_) => break, // Past the last page
+                                    Err(e) => {
+                                        warn!("Error fetching page: {}", e);
+                                        break;
+                                    }
+                                }
+                                pages_fetched = page_num;
+                            }
                             
                             if !all_handles.is_empty() {
                                 let final_count = if max_products > 0 && all_handles.len() > max_products {
@@ -545,7 +891,7 @@ impl ShopifyScraper {
                                 };
                                 
                                 info!("Discovered {} products from {} (parallel pagination, {} pages)", 
-                                      final_count, domain, max_pages);
+                                      final_count, domain, pages_fetched);
                                 return Ok(all_handles);
                             }
                         } else {
@@ -580,8 +926,43 @@ impl ShopifyScraper {
         Ok(vec![])
     }
 
-    /// Discover total number of pages by sequential checking
-    async fn discover_total_pages(&self, domain: &str, base_url: &str, limit: usize) -> Result<usize> {
+    /// Fetch one products.json listing page and return its handles
+    async fn fetch_page_handles(client: Client, page_url: String, page_num: usize) -> Result<Vec<String>> {
+        match client.get(&page_url).send().await {
+            Ok(response) if response.status() == reqwest::StatusCode::OK => {
+                match response.json::<ProductListPage>().await {
+                    Ok(data) => {
+                        if let Some(products) = data.products {
+                            let handles: Vec<String> = products
+                                .into_iter()
+                                .filter_map(|p| p.handle)
+                                .collect();
+                            debug!("Page {} returned {} products", page_num, handles.len());
+                            Ok(handles)
+                        } else {
+                            debug!("Page {} has no products array", page_num);
+                            Ok(Vec::new())
+                        }
+                    }
+                    Err(e) => {
+                        warn!("Failed to parse JSON for page {}: {}", page_num, e);
+                        Err(e.into())
+                    }
+                }
+            }
+            Ok(response) => {
+                debug!("Page {} returned status: {}", page_num, response.status());
+                Ok(Vec::new()) // Non-200 status
+            }
+            Err(e) => {
+                warn!("Failed to fetch page {}: {}", page_num, e);
+                Err(e.into())
+            }
+        }
+    }
+
+    /// Discover total number of pages by sequential checking, stopping at `page_cap` (0 = no cap)
+    async fn discover_total_pages(&self, domain: &str, base_url: &str, limit: usize, page_cap: usize) -> Result<usize> {
         // Sequential approach: keep checking pages until we get an empty response
         let mut page = 2; // Start from page 2 since we already checked page 1
         let mut last_valid_page = 1;
@@ -591,15 +972,20 @@ impl ShopifyScraper {
             
             match self.client.get(&test_url).send().await {
                 Ok(response) if response.status() == reqwest::StatusCode::OK => {
-                    match response.json::<serde_json::Value>().await {
+                    match response.json::<ProductListPage>().await {
                         Ok(data) => {
-                            if let Some(products) = data.get("products").and_then(|p| p.as_array()) {
+                            if let Some(products) = data.products {
                                 if products.is_empty() {
                                     // Empty page means we've reached the end
                                     break;
                                 } else {
                                     last_valid_page = page;
                                     page += 1;
+
+                                    // Enough pages to cover what we were asked for
+                                    if page_cap > 0 && last_valid_page >= page_cap {
+                                        break;
+                                    }
                                     
                                     // Safety check to prevent infinite loops
                                     if page > 1000 {
@@ -640,9 +1026,38 @@ impl Clone for ShopifyScraper {
         Self {
             client: self.client.clone(),
             semaphore: self.semaphore.clone(),
+            concurrency_limit: self.concurrency_limit.clone(),
+            successes: self.successes.clone(),
+            last_throttled: self.last_throttled.clone(),
             timeout: self.timeout,
             config: self.config.clone(),
             domain_limits: self.domain_limits.clone(),
+            product_cache: self.product_cache.clone(),
         }
     }
-}
\ No newline at end of file
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn product_url(handle: &str) -> String {
+        let products_url = ShopifyScraper::products_base_url("https://example.com").unwrap();
+        ShopifyScraper::product_json_url(&products_url, handle).to_string()
+    }
+
+    #[test]
+    fn product_json_url_plain_handle() {
+        assert_eq!(product_url("blue-shirt"), "https://example.com/products/blue-shirt.json");
+    }
+
+    #[test]
+    fn product_json_url_unicode_handle() {
+        assert_eq!(product_url("café"), "https://example.com/products/caf%C3%A9.json");
+    }
+
+    #[test]
+    fn product_json_url_pre_encoded_handle() {
+        assert_eq!(product_url("caf%C3%A9"), "https://example.com/products/caf%C3%A9.json");
+    }
+}